@@ -1,10 +1,262 @@
+import functools
+import math
+import os
 import numpy as np
 from typing import List
-import matplotlib.pyplot as plt 
-from mpl_toolkits.mplot3d import Axes3D
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+
+# smallest number of beads for which the optional Numba kernels amortise importing numba and
+# loading the compiled kernels (~0.4s with a warm cache) against the NumPy path (~0.5s at 1e7 beads)
+_NUMBA_MIN_N = 10_000_000
+
+# smallest number of beads for which the optional numexpr granny path amortises importing numexpr (~0.13s)
+_NUMEXPR_MIN_N = 10_000_000
+
+# largest number of beads whose coordinates are memoised, so each cache entry holds at most ~1.2MB
+_CACHE_MAX_N = 100_000
+
+
+def _sincos(a: np.ndarray):
+    """Evaluates the sine and cosine of the same angles
+
+    :param a (np.ndarray): array of angles (in radians)
+
+    :return (np.ndarray, np.ndarray) the sine and cosine of a
+    """
+    return np.sin(a), np.cos(a)
+
+
+def _angle_multiples(s1, c1):
+    """Derives the sine and cosine of 2t, 3t and 4t from those of t via the angle-addition identities
+
+    :param s1 (np.ndarray): sine of the angles t
+    :param c1 (np.ndarray): cosine of the angles t
+
+    :return (tuple) s2, c2, s3, c3, s4, c4
+    """
+    s2, c2 = 2 * s1 * c1, c1 * c1 - s1 * s1
+    s3, c3 = s2 * c1 + c2 * s1, c2 * c1 - s2 * s1
+    s4, c4 = 2 * s2 * c2, c2 * c2 - s2 * s2
+    return s2, c2, s3, c3, s4, c4
+
+
+@functools.lru_cache(maxsize=None)
+def _numba_kernels() -> dict:
+    """Imports numba and compiles the coordinate kernels on first use
+
+    :return (dict) the kernels keyed by knot type, or an empty dict if numba is not installed
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return {}
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def torus(N, p, q, r_inner, r_outer, out):
+        """Fills out (3, N) with the per-axis coordinates of a (p-q) torus knot"""
+        dt = 2 * math.pi / N if N else 0.0
+        for bead in prange(N):
+            t = bead * dt
+            r = math.cos(q*t) + r_inner
+            out[0, bead] = r_outer * (r * math.cos(p*t))
+            out[1, bead] = r_outer * (r * math.sin(p*t))
+            out[2, bead] = r_outer * (- math.sin(q*t))
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def lissajous(N, n, phi, r_outer, out):
+        """Fills out (3, N) with the per-axis coordinates of a Lissajous knot"""
+        dt = 2 * math.pi / N if N else 0.0
+        for bead in prange(N):
+            t = bead * dt
+            for dimension in range(3):
+                out[dimension, bead] = r_outer * math.cos(n[dimension]*t + phi[dimension])
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def special(N, id, r_inner, r_outer, out):
+        """Fills out (3, N) with the per-axis coordinates of a Special knot (0: 4_1, 1: granny)"""
+        dt = 2 * math.pi / N if N else 0.0
+        for bead in prange(N):
+            t = bead * dt
+            s1, c1 = math.sin(t), math.cos(t)
+            s2, c2 = 2 * s1 * c1, c1 * c1 - s1 * s1
+            s3, c3 = s2 * c1 + c2 * s1, c2 * c1 - s2 * s1
+            s4, c4 = 2 * s2 * c2, c2 * c2 - s2 * s2
+            if id == 0:
+                r = c2 + r_inner
+                out[0, bead] = r_outer * (r * c3)
+                out[1, bead] = r_outer * (r * s3)
+                out[2, bead] = r_outer * (- s4)
+            else:
+                out[0, bead] = (-22*c1 - 128*s1 - 44*c3 - 78*s3) / 80
+                out[1, bead] = (-10*c2 - 27*s2 + 38*c4 + 46*s4) / 80
+                out[2, bead] = (70*c3 - 40*s3) / 100
+
+    return {"torus": torus, "lissajous": lissajous, "special": special}
+
+
+@functools.lru_cache(maxsize=None)
+def _numexpr():
+    """Imports numexpr on first use
+
+    :return the numexpr module, or None if numexpr is not installed
+    """
+    try:
+        import numexpr
+    except ImportError:
+        return None
+    return numexpr
+
+
+def _usable_cpus() -> int:
+    """Counts the CPUs this process may run on, honouring affinity masks where the platform reports them"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _kernel(name: str, N: int):
+    """Returns the Numba kernel for a knot type if N is large enough to amortise it and numba is installed
+
+    :param name (str): the knot type ("torus", "lissajous" or "special")
+    :param N (int): the number of coordinates to generate
+
+    :return the kernel, or None to use the NumPy path
+    """
+    # the kernels only win by running prange across several cores
+    if N < _NUMBA_MIN_N or _usable_cpus() < 2:
+        return None
+    return _numba_kernels().get(name)
+
+
+def _torus_family_coordinates(p: np.ndarray, q: np.ndarray, N: int, r_inner: float, r_outer: float) -> np.ndarray:
+    """Evaluates the per-axis coordinates of K torus knots at once
+
+    :param p (np.ndarray): (K,) array of p-integers
+    :param q (np.ndarray): (K,) array of q-integers
+    :param N (int): the number of coordinates to generate per knot
+    :param r_inner (float): controls radius of inner circle of torus
+    :param r_outer (float): controls radius of outer circle of torus
+
+    :return coordinates (np.ndarray) a C-contiguous (K, 3, N) float32 array, so that row k is a (3, N) torus knot
+    """
+    p = np.asarray(p, dtype=np.float64)
+    q = np.asarray(q, dtype=np.float64)
+
+    kernel = _kernel("torus", N)
+    if kernel is not None:
+        coordinates = np.empty((len(p), 3, N), dtype=np.float32)
+        for k in range(len(p)):
+            kernel(N, p[k], q[k], float(r_inner), float(r_outer), coordinates[k])
+        return coordinates
+
+    # broadcast (1, N) parameter grid against (K, 1) p and q integers
+    t = np.linspace(0.0, 2 * np.pi, N, endpoint=False)[None, :]
+    sq, cq = _sincos(q[:, None] * t)
+    sp, cp = _sincos(p[:, None] * t)
+    r = cq + r_inner
+
+    x = r_outer * (r * cp)
+    y = r_outer * (r * sp)
+    z = r_outer * (- sq)
+
+    return np.stack((x, y, z), axis=1).astype(np.float32)
+
+
+def _memoised(builder, N: int, *args) -> np.ndarray:
+    """Calls a memoised coordinate builder, bypassing its cache for curves too large to keep around
+
+    :param builder: one of the lru_cache'd _*_coordinates builders
+    :param N (int): the number of coordinates to generate
+    :param args: the remaining builder arguments, in order
+
+    :return coordinates (np.ndarray) the read-only (3, N) per-axis coordinates
+    """
+    if N > _CACHE_MAX_N:
+        return builder.__wrapped__(*args)
+    return builder(*args)
+
+
+def clear_coordinate_cache():
+    """Releases every memoised knot coordinate array
+
+    Arrays still referenced by a Knot stay alive; only the cache's own references are dropped.
+    """
+    for builder in (_torus_coordinates, _lissajous_coordinates, _special_coordinates):
+        builder.cache_clear()
+
+
+@functools.lru_cache(maxsize=128)
+def _torus_coordinates(p: int, q: int, N: int, r_inner: float, r_outer: float) -> np.ndarray:
+    """Builds (and memoises) the read-only (3, N) per-axis coordinates of a (p-q) torus knot"""
+    coordinates = _torus_family_coordinates([p], [q], N, r_inner, r_outer)[0]
+
+    coordinates.setflags(write=False)
+    return coordinates
+
+
+@functools.lru_cache(maxsize=128)
+def _lissajous_coordinates(n: tuple, phi: tuple, N: int, r_outer: float) -> np.ndarray:
+    """Builds (and memoises) the read-only (3, N) per-axis coordinates of a Lissajous knot"""
+    kernel = _kernel("lissajous", N)
+    if kernel is not None:
+        coordinates = np.empty((3, N), dtype=np.float32)
+        kernel(N, np.asarray(n, dtype=np.float64), np.asarray(phi, dtype=np.float64),
+               float(r_outer), coordinates)
+    else:
+        # broadcast (1, N) parameter grid against (3, 1) integers and phase-shifts
+        t = np.linspace(0.0, 2 * np.pi, N, endpoint=False)[None, :]
+        n = np.asarray(n, dtype=np.float64)[:, None]
+        phi = np.asarray(phi, dtype=np.float64)[:, None]
+
+        coordinates = (r_outer * np.cos(n*t + phi)).astype(np.float32)
+
+    coordinates.setflags(write=False)
+    return coordinates
+
+
+@functools.lru_cache(maxsize=128)
+def _special_coordinates(id: int, N: int, r_inner: float, r_outer: float) -> np.ndarray:
+    """Builds (and memoises) the read-only (3, N) per-axis coordinates of a Special knot (0: 4_1, 1: granny)"""
+    kernel = _kernel("special", N)
+    if kernel is not None:
+        coordinates = np.empty((3, N), dtype=np.float32)
+        kernel(N, id, float(r_inner), float(r_outer), coordinates)
+    elif id == 1 and N >= _NUMEXPR_MIN_N and _numexpr() is not None:
+        # granny knot, with the angle-addition identities for 2t, 3t and 4t fused by numexpr
+        # into a single pass over sin(t) and cos(t) per axis
+        t = np.linspace(0.0, 2 * np.pi, N, endpoint=False)
+        s1, c1 = _sincos(t)
+        ne = _numexpr()
+        local_dict = {"s1": s1, "c1": c1}
+        x = ne.evaluate("(-22*c1 - 128*s1"
+                        " - 44*(4*c1*c1*c1 - 3*c1) - 78*(3*s1 - 4*s1*s1*s1)) / 80", local_dict=local_dict)
+        y = ne.evaluate("(-10*(c1*c1 - s1*s1) - 27*(2*s1*c1)"
+                        " + 38*(1 - 8*s1*s1*c1*c1) + 46*(4*s1*c1*(c1*c1 - s1*s1))) / 80", local_dict=local_dict)
+        z = ne.evaluate("(70*(4*c1*c1*c1 - 3*c1) - 40*(3*s1 - 4*s1*s1*s1)) / 100", local_dict=local_dict)
+
+        coordinates = np.stack((x, y, z)).astype(np.float32)
+    else:
+        t = np.linspace(0.0, 2 * np.pi, N, endpoint=False)
+        s1, c1 = _sincos(t)
+        s2, c2, s3, c3, s4, c4 = _angle_multiples(s1, c1)
+
+        # 4_1 knot
+        if id == 0:
+            r = c2 + r_inner
+            x = r_outer * (r * c3)
+            y = r_outer * (r * s3)
+            z = r_outer * (- s4)
+
+        # granny knot
+        else:
+            x = (-22*c1 - 128*s1 - 44*c3 - 78*s3) / 80
+            y = (-10*c2 - 27*s2 + 38*c4 + 46*s4) / 80
+            z = (70*c3 - 40*s3) / 100
+
+        coordinates = np.stack((x, y, z)).astype(np.float32)
+
+    coordinates.setflags(write=False)
+    return coordinates
+
 
 class Knot:
     """Base knot class
@@ -21,17 +273,43 @@ class Knot:
         self.name = name
         self.coordinates = coordinates
 
-    def plot(self, save_image: bool = False):
+    @property
+    def coordinates(self) -> np.ndarray:
+        """(N, 3) view of the Cartesian coordinates of the knot
+
+        The coordinates are stored per axis as a (3, N) array so that each of x, y and z is contiguous.
+        """
+        if self._xyz is None:
+            return None
+        return self._xyz.T
+
+    @coordinates.setter
+    def coordinates(self, coordinates: np.ndarray):
+        if coordinates is None:
+            self._xyz = None
+            return
+
+        coordinates = np.asarray(coordinates)
+        if coordinates.ndim != 2 or coordinates.shape[1] != 3:
+            raise ValueError(f"coordinates must have shape (N, 3), got {coordinates.shape}")
+
+        self._xyz = np.ascontiguousarray(coordinates.T)
+
+    def plot(self, save_image: bool = False, ax=None):
         """Visualises the knot coordinates using a 3D plot
         
         :param save_image (bool): a flag indicating (if True) to save the generated 3D visualisation 
+        :param ax (Axes3D): an existing 3D axes to draw onto; if given, no new figure is created or shown
         """
-        fig = plt.figure(figsize = (6, 5))
-        ax = plt.axes(projection = "3d")
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d import Axes3D
+
+        fig = None
+        if ax is None:
+            fig = plt.figure(figsize = (6, 5))
+            ax = fig.add_subplot(111, projection = "3d")
         
-        x = self.coordinates[:, 0]
-        y = self.coordinates[:, 1]
-        z = self.coordinates[:, 2]
+        x, y, z = self._xyz
 
         ax.plot3D(x, y, z)
         ax.text2D(0.15, 0.85, str(self.name), transform = ax.transAxes)
@@ -40,9 +318,11 @@ class Knot:
         ax.set_zlabel('Z axis')
 
         if save_image:
-            plt.savefig(str(self.name) + "_knot.png")
+            ax.figure.savefig(str(self.name) + "_knot.png")
 
-        plt.show()
+        if fig is not None:
+            plt.show()
+            plt.close(fig)
         return
 
     def visualise(self):
@@ -50,22 +330,29 @@ class Knot:
         
         :param save_image (bool): a flag indicating (if True) to save the generated 3D visualisation 
         """        
-        x = self.coordinates[:, 0]
-        y = self.coordinates[:, 1]
-        z = self.coordinates[:, 2]
+        import plotly.graph_objects as go
+
+        # downsample very long curves to keep the browser-side payload manageable
+        stride = max(1, self._xyz.shape[1] // 20000)
+
+        xyz = self._xyz[:, ::stride]
+
+        # the parameter grid excludes t = 2*pi, so repeat the first bead to close the curve
+        x, y, z = np.concatenate((xyz, xyz[:, :1]), axis=1)
 
         #fig = px.line_3d(self.coo)
-        fig = go.Figure(data=[go.Scatter3d(x=x, y=y, z=z, mode='markers')])
+        fig = go.Figure(data=[go.Scatter3d(x=x, y=y, z=z, mode='lines', line=dict(width=4))])
         
         fig.show()
   
         return
 
-    def save_coordinates(self, title: str = None, suffix: str = "dat"):
+    def save_coordinates(self, title: str = None, suffix: str = "dat", binary: bool = False):
         """Saves 3D coordinates of the knot to a textfile
         
         :param title (str): The prefix for the file name to save the coordinates
-        :param suffix (str): The filenmae extension type to save as (default: "dat")
+        :param suffix (str): The filenmae extension type to save as (default: "dat"); ignored if binary is True
+        :param binary (bool): a flag indicating (if True) to save the coordinates as a binary title.npy file instead
         """
         if title is None:
             if self.name is not None:
@@ -73,7 +360,13 @@ class Knot:
             else:
                 title = "Knot"
 
-        np.savetxt(title + "." + suffix, self.coordinates, fmt='%1.4f')
+        if binary:
+            np.save(title + ".npy", self.coordinates)
+        else:
+            # one %-format over every row gives the same bytes as np.savetxt(fmt='%1.4f') without its per-row loop
+            row = " ".join(["%1.4f"] * self._xyz.shape[0]) + "\n"
+            with open(title + "." + suffix, "w") as f:
+                f.write("".join([row] * self._xyz.shape[1]) % tuple(self.coordinates.ravel().tolist()))
 
         return
 
@@ -91,7 +384,7 @@ class Torus(Knot):
         :param N (int): the number of coordinates to generate
 
         """
-        Knot.__init__(self, name="(" + str(p) + "-" + str(q) + ")-Torus." + str(N))
+        Knot.__init__(self, name=f"({p}-{q})-Torus.{N}")
         self.p = p
         self.q = q
         self.N = N
@@ -106,22 +399,13 @@ class Torus(Knot):
         :return self.coordinates (np.ndarray) a 3D array containing the Cartesian coordinates of the generated torus knot
         """
         
-        self.coordinates = np.empty((self.N, 3))
         if r_inner is None:
             r_inner = 2
 
         if r_outer is None:
             r_outer = 1
 
-
-        for bead in range(self.N):
-            t = 2 * np.pi * bead / self.N
-            r = np.cos(self.q*t) + r_inner
-
-            self.coordinates[bead][0] = r_outer * (r * np.cos(self.p*t))
-            self.coordinates[bead][1] = r_outer * (r * np.sin(self.p*t))
-            self.coordinates[bead][2] = r_outer * (- np.sin(self.q*t))      
-
+        self._xyz = _memoised(_torus_coordinates, self.N, self.p, self.q, self.N, r_inner, r_outer)
 
         return self.coordinates 
 
@@ -139,7 +423,7 @@ class Lissajous(Knot):
         :param N (int): the number of coordinates to generate
 
         """
-        Knot.__init__(self, name="Lissajous." + str(N))
+        Knot.__init__(self, name=f"Lissajous.{N}")
         self.n = n
         self.phi = phi
         self.N = N
@@ -150,16 +434,10 @@ class Lissajous(Knot):
 
         :param r_outer (float): controls amplitude of Lissajous knot
         """
-        self.coordinates = np.empty((self.N, 3))
-
         if r_outer is None:
             r_outer = 2
 
-        for bead in range(self.N):
-            t = 2 * np.pi * bead / self.N
-
-            for dimension in range(3):
-                self.coordinates[bead][dimension] = r_outer * np.cos(self.n[dimension]*t + self.phi[dimension])
+        self._xyz = _memoised(_lissajous_coordinates, self.N, tuple(self.n), tuple(self.phi), self.N, r_outer)
 
         return 
 
@@ -174,7 +452,7 @@ class Special(Knot):
         :param N (int): the number of coordinates to generate
 
         """
-        Knot.__init__(self, name="Figure-eight." + str(N) if id == 0 else "Granny." + str(N))
+        Knot.__init__(self, name=f"Figure-eight.{N}" if id == 0 else f"Granny.{N}")
         self.id = id
         self.N = N
 
@@ -184,30 +462,38 @@ class Special(Knot):
         :param r_inner (float): controls radius of inner circle of torus
         :param r_outer (float): controls radius of outer circle of torus
         """
-        self.coordinates = np.empty((self.N, 3))
-        
-        # 4_1 knot
-        if self.id == 0:
+        if r_inner == None:
+            r_inner = 2
 
-            if r_inner == None:
-                r_inner = 2
+        if r_outer == None:
+            r_outer = 1
 
-            if r_outer == None:
-                r_outer = 1
+        if self.id not in (0, 1):
+            return
 
-            for bead in range(self.N):
-                t = 2 * np.pi * bead / self.N
-                r = np.cos(2*t) + r_inner
-                self.coordinates[bead][0] = r_outer * (r * np.cos(3*t))
-                self.coordinates[bead][1] = r_outer * (r * np.sin(3*t))
-                self.coordinates[bead][2] = r_outer * (- np.sin(4*t))  
+        # the granny knot does not depend on the radii, so keep them out of its cache key
+        if self.id == 1:
+            r_inner, r_outer = 2, 1
 
-        # granny knot
-        elif self.id == 1:
-            for bead in range(self.N):
-                t = 2 * np.pi * bead / self.N
-                self.coordinates[bead][0] = (-22*np.cos(t) - 128*np.sin(t) - 44*np.cos(3*t) - 78*np.sin(3*t)) / 80
-                self.coordinates[bead][1] = (-10*np.cos(2*t) - 27*np.sin(2*t) + 38*np.cos(4*t) + 46*np.sin(4*t)) / 80
-                self.coordinates[bead][2] = (70*np.cos(3*t) - 40*np.sin(3*t)) / 100
+        self._xyz = _memoised(_special_coordinates, self.N, self.id, self.N, r_inner, r_outer)
 
-        return 
+        return
+
+
+def generate_torus_family(pqs: List[tuple], N: int = 100, r_inner: float = 2, r_outer: float = 1) -> np.ndarray:
+    """Generates the coordinates of a whole family of (p-q) torus knots in one pass
+
+    Row k holds the same (N, 3) coordinates as Torus(p_k, q_k, N).generate_coordinates(). Each row is a view onto
+    per-axis storage, so assigning it to the coordinates of a Torus shares the memory instead of copying it.
+
+    :param pqs List(tuple): a list of (p, q) integer pairs defining each torus knot
+    :param N (int): the number of coordinates to generate per knot
+    :param r_inner (float): controls radius of inner circle of torus
+    :param r_outer (float): controls radius of outer circle of torus
+
+    :return coordinates (np.ndarray) a (K, N, 3) array containing the Cartesian coordinates of the K torus knots
+    """
+    p = [pq[0] for pq in pqs]
+    q = [pq[1] for pq in pqs]
+
+    return _torus_family_coordinates(p, q, N, r_inner, r_outer).transpose(0, 2, 1)
@@ -0,0 +1,177 @@
+import numpy as np
+import pytest
+
+import knots
+
+
+def _reference_torus(p, q, N, r_inner=2, r_outer=1):
+    coordinates = np.empty((N, 3))
+    for bead in range(N):
+        t = 2 * np.pi * bead / N
+        r = np.cos(q*t) + r_inner
+        coordinates[bead] = r_outer * (r * np.cos(p*t)), r_outer * (r * np.sin(p*t)), r_outer * (- np.sin(q*t))
+    return coordinates
+
+
+def _reference_lissajous(n, phi, N, r_outer=2):
+    coordinates = np.empty((N, 3))
+    for bead in range(N):
+        t = 2 * np.pi * bead / N
+        for dimension in range(3):
+            coordinates[bead, dimension] = r_outer * np.cos(n[dimension]*t + phi[dimension])
+    return coordinates
+
+
+def _reference_special(id, N, r_inner=2, r_outer=1):
+    coordinates = np.empty((N, 3))
+    for bead in range(N):
+        t = 2 * np.pi * bead / N
+        if id == 0:
+            r = np.cos(2*t) + r_inner
+            coordinates[bead] = r_outer * (r * np.cos(3*t)), r_outer * (r * np.sin(3*t)), r_outer * (- np.sin(4*t))
+        else:
+            coordinates[bead] = ((-22*np.cos(t) - 128*np.sin(t) - 44*np.cos(3*t) - 78*np.sin(3*t)) / 80,
+                                 (-10*np.cos(2*t) - 27*np.sin(2*t) + 38*np.cos(4*t) + 46*np.sin(4*t)) / 80,
+                                 (70*np.cos(3*t) - 40*np.sin(3*t)) / 100)
+    return coordinates
+
+
+@pytest.fixture(params=["numpy", "numba", "numexpr"])
+def backend(request, monkeypatch):
+    """Forces every builder onto one backend, bypassing the memoisation"""
+    monkeypatch.setattr(knots, "_NUMBA_MIN_N", float("inf"))
+    monkeypatch.setattr(knots, "_NUMEXPR_MIN_N", float("inf"))
+    if request.param == "numba":
+        pytest.importorskip("numba")
+        monkeypatch.setattr(knots, "_NUMBA_MIN_N", 0)
+        monkeypatch.setattr(knots, "_usable_cpus", lambda: 2)
+    elif request.param == "numexpr":
+        pytest.importorskip("numexpr")
+        monkeypatch.setattr(knots, "_NUMEXPR_MIN_N", 0)
+    knots.clear_coordinate_cache()
+    yield request.param
+    knots.clear_coordinate_cache()
+
+
+@pytest.mark.parametrize("N", [0, 1, 7, 1000])
+@pytest.mark.parametrize("p, q", [(3, 2), (7, 11), (-5, 3)])
+def test_torus_matches_reference(backend, p, q, N):
+    torus = knots.Torus(p, q, N)
+    coordinates = torus.generate_coordinates()
+    assert coordinates.shape == (N, 3)
+    np.testing.assert_allclose(coordinates, _reference_torus(p, q, N), rtol=0, atol=1e-6)
+    assert torus.coordinates.dtype == np.float32
+
+
+@pytest.mark.parametrize("N", [0, 1, 7, 1000])
+def test_lissajous_matches_reference(backend, N):
+    lissajous = knots.Lissajous([3, 2, 5], [1.5, 0.2, 0.0], N)
+    lissajous.generate_coordinates()
+    assert lissajous.coordinates.shape == (N, 3)
+    np.testing.assert_allclose(lissajous.coordinates, _reference_lissajous([3, 2, 5], [1.5, 0.2, 0.0], N),
+                               rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("N", [0, 1, 7, 1000])
+@pytest.mark.parametrize("id", [0, 1])
+def test_special_matches_reference(backend, id, N):
+    special = knots.Special(id, N)
+    special.generate_coordinates()
+    assert special.coordinates.shape == (N, 3)
+    np.testing.assert_allclose(special.coordinates, _reference_special(id, N), rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("N", [0, 7, 1000])
+def test_torus_family_matches_torus(backend, N):
+    pqs = [(3, 2), (7, 11), (-5, 3)]
+    family = knots.generate_torus_family(pqs, N)
+    assert family.shape == (len(pqs), N, 3)
+    for (p, q), coordinates in zip(pqs, family):
+        np.testing.assert_array_equal(coordinates, knots.Torus(p, q, N).generate_coordinates())
+
+
+def test_torus_family_rows_attach_to_torus_without_copy():
+    pqs = [(3, 2), (7, 11)]
+    family = knots.generate_torus_family(pqs, 100)
+    for (p, q), coordinates in zip(pqs, family):
+        torus = knots.Torus(p, q, 100)
+        torus.coordinates = coordinates
+        assert torus.coordinates.shape == (100, 3)
+        assert np.shares_memory(torus.coordinates, family)
+
+
+@pytest.mark.parametrize("N", [0, 1, 1000])
+def test_save_coordinates_text_matches_savetxt(tmp_path, N):
+    torus = knots.Torus(7, 11, N)
+    torus.generate_coordinates()
+    torus.save_coordinates(str(tmp_path / "knot"))
+    np.savetxt(tmp_path / "expected.dat", torus.coordinates, fmt='%1.4f')
+    assert (tmp_path / "knot.dat").read_bytes() == (tmp_path / "expected.dat").read_bytes()
+
+
+def test_save_coordinates_binary(tmp_path):
+    torus = knots.Torus(3, 2, 1000)
+    torus.generate_coordinates()
+    torus.save_coordinates(str(tmp_path / "knot"), binary=True)
+    saved = np.load(tmp_path / "knot.npy")
+    assert saved.dtype == np.float32
+    np.testing.assert_array_equal(saved, torus.coordinates)
+
+
+@pytest.mark.parametrize("shape", [(3, 100), (100,), (2, 100, 3)])
+def test_coordinates_setter_rejects_non_n_by_3(shape):
+    knot = knots.Knot()
+    with pytest.raises(ValueError):
+        knot.coordinates = np.zeros(shape)
+
+
+def test_large_curves_bypass_the_cache(monkeypatch):
+    monkeypatch.setattr(knots, "_CACHE_MAX_N", 100)
+    knots.clear_coordinate_cache()
+    small, large = knots.Torus(3, 2, 100), knots.Torus(3, 2, 101)
+    assert np.shares_memory(small.generate_coordinates(), knots.Torus(3, 2, 100).generate_coordinates())
+    assert not np.shares_memory(large.generate_coordinates(), knots.Torus(3, 2, 101).generate_coordinates())
+    assert knots._torus_coordinates.cache_info().currsize == 1
+
+
+def test_granny_cache_ignores_radii():
+    knots.clear_coordinate_cache()
+    for r_inner, r_outer in [(None, None), (3, 4), (5, 6)]:
+        knots.Special(1, 100).generate_coordinates(r_inner, r_outer)
+    assert knots._special_coordinates.cache_info().currsize == 1
+
+
+def test_plot_releases_its_figures(tmp_path, monkeypatch):
+    plt = pytest.importorskip("matplotlib.pyplot")
+    plt.switch_backend("Agg")
+    monkeypatch.chdir(tmp_path)
+    plt.close("all")
+    torus = knots.Torus(3, 2, 100)
+    torus.generate_coordinates()
+    for _ in range(25):
+        torus.plot()
+    torus.plot(save_image=True)
+    assert plt.get_fignums() == []
+    assert (tmp_path / f"{torus.name}_knot.png").exists()
+
+
+def test_plot_onto_existing_axes_leaves_figure_open():
+    plt = pytest.importorskip("matplotlib.pyplot")
+    plt.switch_backend("Agg")
+    plt.close("all")
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection="3d")
+    for p, q in [(3, 2), (5, 2)]:
+        torus = knots.Torus(p, q, 100)
+        torus.generate_coordinates()
+        torus.plot(ax=ax)
+    assert plt.get_fignums() == [fig.number]
+    assert len(ax.lines) == 2
+    plt.close(fig)
+
+
+def test_kernels_skipped_on_a_single_usable_cpu(monkeypatch):
+    monkeypatch.setattr(knots, "_NUMBA_MIN_N", 0)
+    monkeypatch.setattr(knots.os, "cpu_count", lambda: 64)
+    monkeypatch.setattr(knots.os, "sched_getaffinity", lambda pid: {0}, raising=False)
+    assert knots._kernel("torus", 10**8) is None